@@ -2,11 +2,26 @@
 
 import os
 import time
-import json
 import logging
 import threading
 import re
-from datetime import datetime, timedelta
+import sqlite3
+import atexit
+import calendar
+from contextlib import contextmanager
+from datetime import datetime
+from fastrlock.rlock import FastRLock
+
+from utils.data_utils import load_json
+from utils.ttl_cache import TTLCache
+from utils.idle_backoff import IdleBackoff, run_with_reconnect
+from utils.worker_pool import WorkerPool
+
+# Precompiled patterns for the comment stream and flair updates
+_CHEERS_RE = re.compile(r'(?i)!cheers(.*)')
+_SUBCOMMAND_RE = re.compile(r'^(\w+)')
+_USERNAME_RE = re.compile(r'(?i)u/([^\s]+)')
+_FLAIR_SUFFIX_RE = re.compile(r' - :1DFV1:\d+$')
 
 class CheersFeature:
     def __init__(self, reddit, subreddit, signature):
@@ -14,6 +29,9 @@ class CheersFeature:
         self.subreddit = subreddit
 
         # Data files
+        self.DB_FILE = 'cheers.db'
+
+        # Legacy data files, imported into the database on first start
         self.CHEERS_FILE = 'cheers_data.json'
         self.RATE_LIMIT_FILE = 'rate_limit.json'
         self.CHEERS_AWARDED_FILE = 'cheers_awarded_data.json'
@@ -24,32 +42,142 @@ class CheersFeature:
         self.MIN_COMMENT_KARMA = 50
         self.CHEERS_COOLDOWN_SECONDS = 3600/6  # 10 minutes
 
+        # Comment stream producer feeds a small pool of worker threads
+        self.comment_workers = WorkerPool('cheers', self.process_comment)
+
         self.REDDIT_USERNAME = self.reddit.user.me().name
+        self.REDDIT_USERNAME_LOWER = self.REDDIT_USERNAME.lower()
+
+        # Caches of user lookups, keyed by lowercased username
+        self.USER_CACHE_SECONDS = 600
+        self.valid_user_cache = TTLCache(ttl=self.USER_CACHE_SECONDS)
+        self.membership_cache = TTLCache(ttl=self.USER_CACHE_SECONDS)
+
+        # Flair we last set per user, so repeat awards skip the flair read
+        self.FLAIR_CACHE_SECONDS = 1800
+        self.flair_cache = TTLCache(ttl=self.FLAIR_CACHE_SECONDS, maxsize=1000)
+
+        # Striped locks serialize flair updates per recipient across the workers
+        self.FLAIR_LOCK_COUNT = 16
+        self.flair_locks = [threading.Lock() for _ in range(self.FLAIR_LOCK_COUNT)]
 
         # Load data
-        self.lock = threading.Lock()
-        self.cheers_data = self.load_json_data(self.CHEERS_FILE)
-        self.rate_limit_data = self.load_json_data(self.RATE_LIMIT_FILE)
-        self.cheers_awarded_data = self.load_json_data(self.CHEERS_AWARDED_FILE)
+        self.lock = FastRLock()
+        self.batch_depth = 0
+        self.db = self.init_db()
+        atexit.register(self.close_db)
+        self.import_legacy_json_data()
+        self.prune_rate_limit_data()
         self.last_weekly_post_time = self.load_last_weekly_post_time()
 
         self.signature = signature
 
+        # Canned replies, composed once with the signature
+        self.REPLY_SELF_AWARD = f"You cannot award cheers to yourself!{signature}"
+        self.REPLY_NO_RECIPIENT = f"Cannot find the user to award cheers to.{signature}"
+
+        # Cached '!cheers top' reply, cleared whenever cheers are awarded
+        self.top_reply = None
+
+        # '!cheers <subcommand>' handlers; anything else is treated as an award
+        self.SUBCOMMANDS = {
+            'me': self.reply_cheers_count,
+            'top': self.reply_leaderboard,
+        }
+
     def load_json_data(self, file_name):
         with self.lock:
-            if os.path.exists(file_name):
-                with open(file_name, 'r') as f:
-                    return json.load(f)
+            return load_json(file_name)
+
+    def init_db(self):
+        # Autocommit mode; multi-statement updates are grouped with batch()
+        db = sqlite3.connect(self.DB_FILE, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS cheers (username TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS cheers_awarded (username TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS rate_limit (username TEXT PRIMARY KEY, last_ts INTEGER NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        # Indexes for the leaderboards
+        db.execute("CREATE INDEX IF NOT EXISTS cheers_count_idx ON cheers (count)")
+        db.execute("CREATE INDEX IF NOT EXISTS cheers_awarded_count_idx ON cheers_awarded (count)")
+        return db
+
+    def close_db(self):
+        # Checkpoint the WAL into the main database file on shutdown
+        with self.lock:
+            self.db.close()
+
+    @contextmanager
+    def batch(self):
+        # Group database writes into one transaction; nested batches join the outer one
+        with self.lock:
+            if self.batch_depth == 0:
+                self.db.execute("BEGIN")
+            self.batch_depth += 1
+            try:
+                yield
+            except Exception:
+                if self.batch_depth == 1:
+                    self.db.execute("ROLLBACK")
+                raise
             else:
-                return {}
+                if self.batch_depth == 1:
+                    self.db.execute("COMMIT")
+            finally:
+                self.batch_depth -= 1
+
+    def import_legacy_json_data(self):
+        # Import once; the marker in the state table records that it happened.
+        # Databases from before the marker existed are recognised by their cheers rows
+        if self.db.execute("SELECT 1 FROM state WHERE key = 'legacy_imported'").fetchone():
+            return
 
-    def save_json_data(self, data, file_name):
+        with self.batch():
+            if not self.db.execute("SELECT 1 FROM cheers LIMIT 1").fetchone():
+                cheers_data = self.load_json_data(self.CHEERS_FILE)
+                cheers_awarded_data = self.load_json_data(self.CHEERS_AWARDED_FILE)
+                rate_limit_data = self.load_json_data(self.RATE_LIMIT_FILE)
+
+                # Rate limit timestamps were stored as UTC strings; convert to epoch seconds
+                rate_limit_rows = [
+                    (username, calendar.timegm(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timetuple()))
+                    for username, timestamp in rate_limit_data.items()
+                ]
+
+                self.db.executemany("INSERT OR IGNORE INTO cheers (username, count) VALUES (?, ?)", cheers_data.items())
+                self.db.executemany("INSERT OR IGNORE INTO cheers_awarded (username, count) VALUES (?, ?)", cheers_awarded_data.items())
+                self.db.executemany("INSERT OR IGNORE INTO rate_limit (username, last_ts) VALUES (?, ?)", rate_limit_rows)
+                if cheers_data or cheers_awarded_data or rate_limit_data:
+                    logging.info(f"Imported {len(cheers_data)} cheers records from legacy JSON files.")
+
+            self.db.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('legacy_imported', 1)")
+
+    def prune_rate_limit_data(self):
+        # Entries past the cooldown no longer affect anything
+        cutoff = int(time.time() - self.CHEERS_COOLDOWN_SECONDS)
+        with self.batch():
+            deleted = self.db.execute("DELETE FROM rate_limit WHERE last_ts < ?", (cutoff,)).rowcount
+        if deleted:
+            logging.info(f"Pruned {deleted} expired cheers rate limit entries.")
+
+    def get_cheers_count(self, username):
         with self.lock:
-            with open(file_name, 'w') as f:
-                json.dump(data, f)
+            row = self.db.execute("SELECT count FROM cheers WHERE username = ?", (username.lower(),)).fetchone()
+        return row[0] if row else 0
+
+    def get_leaderboard(self, table, limit):
+        # Served straight from the count index instead of sorting every user
+        with self.lock:
+            return self.db.execute(f"SELECT username, count FROM {table} ORDER BY count DESC LIMIT ?", (limit,)).fetchall()
 
     def load_last_weekly_post_time(self):
-        if os.path.exists(self.LAST_WEEKLY_POST_FILE):
+        row = self.db.execute("SELECT value FROM state WHERE key = 'last_weekly_post'").fetchone()
+        if row:
+            return datetime.utcfromtimestamp(row[0])
+        elif os.path.exists(self.LAST_WEEKLY_POST_FILE):
+            # Fall back to the legacy text file until the next weekly post is recorded
             with open(self.LAST_WEEKLY_POST_FILE, 'r') as f:
                 timestamp = f.read()
                 return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
@@ -57,44 +185,59 @@ class CheersFeature:
             return None
 
     def save_last_weekly_post_time(self):
-        with open(self.LAST_WEEKLY_POST_FILE, 'w') as f:
-            f.write(datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
-
-    def update_user_flair(self, username, cheers_count):
-        # Fetch the user's existing flair
-        existing_flair = self.subreddit.flair(username)
-        flair_text = ''
-        flair_css_class = ''
-        for flair in existing_flair:
-            flair_text = flair['flair_text'] or ''
-            flair_css_class = flair['flair_css_class'] or ''
-
-        # Remove any existing cheers count from the flair in the format " - :emoji:#"
-        flair_text = re.sub(r' - :1DFV1:\d+$', '', flair_text).strip()
-
-        # Append the new cheers count using the updated format " - :emoji:#"
-        new_flair_text = f"{flair_text} - :1DFV1:{cheers_count}".strip()
-
-        # Ensure the flair text doesn't exceed Reddit's limit (64 characters)
-        if len(new_flair_text) > 64:
-            allowed_length = 64 - len(f" - :1DFV1:{cheers_count}")
-            flair_text = flair_text[:allowed_length].rstrip()
-            new_flair_text = f"{flair_text} - :1DFV1:{cheers_count}"
-
-        # Update the user's flair
-        self.subreddit.flair.set(username, text=new_flair_text, css_class=flair_css_class)
-        logging.info(f"Updated flair for {username}: {new_flair_text}")
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO state (key, value) VALUES ('last_weekly_post', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (int(time.time()),)
+            )
+
+    def update_user_flair(self, username):
+        # Read the count and write the flair under the recipient's lock, so a slower
+        # worker can't overwrite a newer count with the one from its own award
+        with self.flair_locks[hash(username.lower()) % self.FLAIR_LOCK_COUNT]:
+            cheers_count = self.get_cheers_count(username)
+
+            # Fetch the user's existing flair, unless we set it recently
+            cached_flair = self.flair_cache.get(username.lower())
+            if cached_flair is not None:
+                flair_text, flair_css_class = cached_flair
+            else:
+                existing_flair = self.subreddit.flair(username)
+                flair_text = ''
+                flair_css_class = ''
+                for flair in existing_flair:
+                    flair_text = flair['flair_text'] or ''
+                    flair_css_class = flair['flair_css_class'] or ''
+
+            # Remove any existing cheers count from the flair in the format " - :emoji:#"
+            flair_text = _FLAIR_SUFFIX_RE.sub('', flair_text).strip()
+
+            # Append the new cheers count using the updated format " - :emoji:#"
+            new_flair_text = f"{flair_text} - :1DFV1:{cheers_count}".strip()
+
+            # Ensure the flair text doesn't exceed Reddit's limit (64 characters)
+            if len(new_flair_text) > 64:
+                allowed_length = 64 - len(f" - :1DFV1:{cheers_count}")
+                flair_text = flair_text[:allowed_length].rstrip()
+                new_flair_text = f"{flair_text} - :1DFV1:{cheers_count}"
+
+            # Update the user's flair
+            self.subreddit.flair.set(username, text=new_flair_text, css_class=flair_css_class)
+            self.flair_cache.set(username.lower(), (new_flair_text, flair_css_class))
+            logging.info(f"Updated flair for {username}: {new_flair_text}")
 
     def can_award_cheers(self, author):
-        current_time = datetime.utcnow()
+        current_ts = time.time()
         author_name = author.name
 
         # Rate limiting check
-        last_award_time_str = self.rate_limit_data.get(author_name)
-        if last_award_time_str:
-            last_award_time = datetime.strptime(last_award_time_str, "%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            row = self.db.execute("SELECT last_ts FROM rate_limit WHERE username = ?", (author_name,)).fetchone()
+        if row:
+            time_since_last_award = current_ts - row[0]
 
-            if (current_time - last_award_time).total_seconds() < self.CHEERS_COOLDOWN_SECONDS:
+            if time_since_last_award < self.CHEERS_COOLDOWN_SECONDS:
                 time_remaining = int((self.CHEERS_COOLDOWN_SECONDS - time_since_last_award) // 60) + 1
                 return False, (
                     f"You can only award cheers once every {int(self.CHEERS_COOLDOWN_SECONDS // 60)} minutes. "
@@ -102,7 +245,7 @@ class CheersFeature:
                 )
 
         # Account age check
-        account_age_days = (current_time - datetime.utcfromtimestamp(author.created_utc)).days
+        account_age_days = int((current_ts - author.created_utc) // 86400)
         if account_age_days < self.MIN_ACCOUNT_AGE_DAYS:
             return False, f"Your account must be at least {self.MIN_ACCOUNT_AGE_DAYS} days old to award cheers."
 
@@ -113,142 +256,178 @@ class CheersFeature:
         return True, ""
 
     def is_valid_reddit_user(self, username):
+        if self.valid_user_cache.get(username.lower()):
+            return True
+
         try:
             user = self.reddit.redditor(username)
             # Try fetching the user's attributes to see if they exist
             user.id  # Accessing the id attribute will raise an exception if the user doesn't exist
+            # Only successful lookups are cached, since a failure may be a transient API error
+            self.valid_user_cache.set(username.lower(), True)
             return True
         except Exception as e:
             logging.error(f"Reddit user {username} does not exist: {e}")
             return False
 
     def is_user_part_of_subreddit(self, username):
+        if self.membership_cache.get(username.lower()):
+            return True
+
         try:
-            # Fetch the redditor object for the given username
             user = self.reddit.redditor(username)
+            subreddit_name = self.subreddit.display_name.lower()
 
-            # Check if the user has made any submissions in the subreddit
-            submissions = list(user.submissions.new(limit=10))
-            for submission in submissions:
-                if submission.subreddit.display_name.lower() == self.subreddit.display_name.lower():
-                    return True
-
-            # Check if the user has commented in the subreddit
-            comments = list(user.comments.new(limit=10))
-            for comment in comments:
-                if comment.subreddit.display_name.lower() == self.subreddit.display_name.lower():
-                    return True
+            try:
+                # A single search request answers the question for users who have posted here;
+                # quoted so hyphenated names are matched as one term
+                is_member = next(iter(self.subreddit.search(f'author:"{username}"', sort='new', limit=1)), None) is not None
+            except Exception as e:
+                # Search can be unavailable; scan the user's recent submissions instead
+                logging.warning(f"Subreddit search failed for {username}, scanning submissions: {e}")
+                is_member = any(
+                    submission.subreddit.display_name.lower() == subreddit_name
+                    for submission in user.submissions.new(limit=10)
+                )
 
-            # If neither submissions nor comments in the subreddit are found, return False
-            return False
+            # Search only covers submissions, so fall back to the user's recent comments;
+            # any() stops at the first match instead of materializing the listing
+            if not is_member:
+                is_member = any(
+                    comment.subreddit.display_name.lower() == subreddit_name
+                    for comment in user.comments.new(limit=10)
+                )
 
         except Exception as e:
             logging.error(f"Failed to check subreddit membership for {username}: {e}")
             return False
 
+        # Only positive results are cached, so a user who just started posting isn't turned away
+        if is_member:
+            self.membership_cache.set(username.lower(), True)
+        return is_member
+
     def handle_cheers(self, mentioned_username, awarder, comment, reason_text):
         author_name = awarder.name
 
         # Remove 'u/' prefix from the mentioned username if present
-        mentioned_username = mentioned_username.lstrip('u/').lstrip('/')
+        mentioned_username = mentioned_username.removeprefix('/u/').removeprefix('u/').removeprefix('/')
 
         # Check if the mentioned username exists
         if not self.is_valid_reddit_user(mentioned_username):
-            content = f"User u/{mentioned_username} does not exist on Reddit."
-            content += self.signature
-            comment.reply(content)
+            comment.reply(f"User u/{mentioned_username} does not exist on Reddit.{self.signature}")
             logging.info(f"{author_name} mentioned non-existent user: {mentioned_username}")
             return
 
         # Check if the mentioned user is part of the subreddit
         if not self.is_user_part_of_subreddit(mentioned_username):
-            content = f"User u/{mentioned_username} is not active in this subreddit."
-            content += self.signature
-            comment.reply(content)
+            comment.reply(f"User u/{mentioned_username} is not active in this subreddit.{self.signature}")
             logging.info(f"{author_name} mentioned a user not part of the subreddit: {mentioned_username}")
             return
 
         if mentioned_username.lower() == author_name.lower():
-            content = "You cannot award cheers to yourself!"
-            content += self.signature
-            comment.reply(content)
+            comment.reply(self.REPLY_SELF_AWARD)
             logging.info(f"{author_name} tried to award cheers to themselves.")
             return
 
         # Security checks
         can_award, message = self.can_award_cheers(awarder)
         if not can_award:
-            content = message
-            content += self.signature
-            comment.reply(content)
+            comment.reply(f"{message}{self.signature}")
             logging.info(f"{author_name} failed security checks: {message}")
             return
 
-        # Update rate limit data
-        self.rate_limit_data[author_name] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-        self.save_json_data(self.rate_limit_data, self.RATE_LIMIT_FILE)
+        # If all checks pass, record the award in a single transaction
+        with self.batch():
+            # Update rate limit data; the WHERE clause makes this a no-op if another
+            # worker recorded an award by the same user within the cooldown
+            recorded = self.db.execute(
+                "INSERT INTO rate_limit (username, last_ts) VALUES (?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET last_ts = excluded.last_ts "
+                "WHERE excluded.last_ts - rate_limit.last_ts >= ?",
+                (author_name, int(time.time()), self.CHEERS_COOLDOWN_SECONDS)
+            ).rowcount
+
+            if recorded:
+                # Update cheers data for the recipient
+                cheers_count = self.db.execute(
+                    "INSERT INTO cheers (username, count) VALUES (?, 1) "
+                    "ON CONFLICT(username) DO UPDATE SET count = count + 1 RETURNING count",
+                    (mentioned_username.lower(),)
+                ).fetchone()[0]
+
+                # Update cheers awarded data for the awarder
+                self.db.execute(
+                    "INSERT INTO cheers_awarded (username, count) VALUES (?, 1) "
+                    "ON CONFLICT(username) DO UPDATE SET count = count + 1",
+                    (author_name.lower(),)
+                )
 
-        # If all checks pass, proceed with awarding cheers
-        with self.lock:
-            # Update cheers data for the recipient
-            cheers_count = self.cheers_data.get(mentioned_username.lower(), 0) + 1
-            self.cheers_data[mentioned_username.lower()] = cheers_count
-        self.save_json_data(self.cheers_data, self.CHEERS_FILE)
+                # The cached leaderboard reply is now stale; cleared inside the transaction
+                # (under self.lock) so a concurrent '!cheers top' can't re-cache the old one
+                self.top_reply = None
 
-        # Update cheers awarded data for the awarder
-        self.cheers_awarded_data[author_name.lower()] = self.cheers_awarded_data.get(author_name.lower(), 0) + 1
-        self.save_json_data(self.cheers_awarded_data, self.CHEERS_AWARDED_FILE)
+        if not recorded:
+            _, message = self.can_award_cheers(awarder)
+            comment.reply(f"{message}{self.signature}")
+            logging.info(f"{author_name} lost a concurrent cheers award to the cooldown.")
+            return
 
         # Update flair
-        self.update_user_flair(mentioned_username, cheers_count)
+        self.update_user_flair(mentioned_username)
 
         # Reply to the comment
-        content = f"u/{author_name} has awarded cheers to u/{mentioned_username}! They now have {cheers_count} cheers.{reason_text}"
-        content += self.signature
-        comment.reply(content)
+        comment.reply(f"u/{author_name} has awarded cheers to u/{mentioned_username}! They now have {cheers_count} cheers.{reason_text}{self.signature}")
         logging.info(f"cheers awarded to {mentioned_username} by {author_name}.")
 
+    def reply_cheers_count(self, comment, author_name):
+        # Handle '!cheers me'
+        cheers_count = self.get_cheers_count(author_name)
+        comment.reply(f"You have {cheers_count} cheers.{self.signature}")
+        logging.info(f"Replied to {author_name} with their cheers count.")
+
+    def reply_leaderboard(self, comment, author_name):
+        # Handle '!cheers top'; the reply is rebuilt only after an award changes it
+        # Read and cache under self.lock so an award can't commit between the two
+        with self.lock:
+            top_reply = self.top_reply
+            if top_reply is None:
+                top_users = self.get_leaderboard('cheers', 5)
+                leaderboard = '\n'.join([f"{idx+1}. u/{user} - {count} cheers" for idx, (user, count) in enumerate(top_users)])
+                top_reply = self.top_reply = f"**Cheers Leaderboard:**\n\n{leaderboard}{self.signature}"
+        comment.reply(top_reply)
+        logging.info(f"Provided leaderboard to {author_name}.")
+
     def process_cheers_command(self, comment, command_text):
         awarder = comment.author
         author_name = awarder.name
 
         # Find the position of '!cheers' in the comment body
         body = comment.body
-        cheers_match = re.search(r'(?i)!cheers', body)
+        cheers_match = _CHEERS_RE.search(body)
         if not cheers_match:
             # Should not happen, since this method is called when '!cheers' is found
             return
 
         cheers_start = cheers_match.start()
-        cheers_end = cheers_match.end()
+        cheers_end = cheers_match.start(1)
 
         # Get the text after '!cheers'
         after_cheers = body[cheers_end:].strip()
 
-        # Check for '!cheers me' or '!cheers top'
-        if re.match(r'(?i)^(me)\b', after_cheers):
-            # Handle '!cheers me'
-            cheers_count = self.cheers_data.get(author_name.lower(), 0)
-            content = f"You have {cheers_count} cheers."
-            content += self.signature
-            comment.reply(content)
-            logging.info(f"Replied to {author_name} with their cheers count.")
-            return
-        elif re.match(r'(?i)^(top)\b', after_cheers):
-            # Handle '!cheers top'
-            top_users = sorted(self.cheers_data.items(), key=lambda x: x[1], reverse=True)[:5]
-            leaderboard = '\n'.join([f"{idx+1}. u/{user} - {count} cheers" for idx, (user, count) in enumerate(top_users)])
-            content = f"**Cheers Leaderboard:**\n\n{leaderboard}"
-            content += self.signature
-            comment.reply(content)
-            logging.info(f"Provided leaderboard to {author_name}.")
-            return
+        # Dispatch '!cheers me' and '!cheers top' subcommands
+        subcommand_match = _SUBCOMMAND_RE.match(after_cheers)
+        if subcommand_match:
+            handler = self.SUBCOMMANDS.get(subcommand_match.group(1).lower())
+            if handler:
+                handler(comment, author_name)
+                return
 
         # Check if a 'u/username' follows
-        username_match = re.search(r'(?i)u/[^\s]+', after_cheers)
+        username_match = _USERNAME_RE.search(after_cheers)
         if username_match:
             # Extract username
-            mentioned_username = username_match.group().lstrip('u/').lstrip('/')
+            mentioned_username = username_match.group(1).removeprefix('/')
             # The reason is the rest of the message after the username
             reason_start = username_match.end()
             reason = after_cheers[reason_start:].strip()
@@ -259,9 +438,7 @@ class CheersFeature:
                 mentioned_username = parent.author.name
                 reason = after_cheers.strip()  # The rest of the message is the reason
             else:
-                content = "Cannot find the user to award cheers to."
-                content += self.signature
-                comment.reply(content)
+                comment.reply(self.REPLY_NO_RECIPIENT)
                 return
 
         # Now handle the cheers
@@ -269,17 +446,34 @@ class CheersFeature:
         self.handle_cheers(mentioned_username, awarder, comment, reason_text)
 
 
+    def process_comment(self, comment):
+        # Skip deleted authors and the bot's own comments
+        author = comment.author
+        if author is None or author.name.lower() == self.REDDIT_USERNAME_LOWER:
+            return
+
+        command_match = _CHEERS_RE.search(comment.body)
+        if command_match:
+            self.process_cheers_command(comment, command_match.group(0))
+
     def monitor_comments(self):
-        for comment in self.subreddit.stream.comments(skip_existing=True):
+        # pause_after=0 yields None whenever a poll finds no new comments,
+        # which lets the weekly post check run on the same loop. PRAW does not
+        # sleep before yielding None, so back off here between empty polls
+        idle_backoff = IdleBackoff()
+        for comment in self.subreddit.stream.comments(skip_existing=True, pause_after=0):
+            if comment is None:
+                self.check_weekly_update()
+                idle_backoff.wait()
+                continue
+            idle_backoff.reset()
+
             try:
-                if comment.author.name == self.REDDIT_USERNAME:
+                # Cheap substring check filters out most comments before any regex work
+                if '!cheers' not in comment.body.lower():
                     continue
 
-                if re.search(r'!cheers', comment.body, re.IGNORECASE):
-                    command_match = re.search(r'(?i)(!cheers.*)', comment.body)
-                    if command_match:
-                        command_text = command_match.group(1)
-                        self.process_cheers_command(comment, command_text)
+                self.comment_workers.submit(comment)
 
             except Exception as e:
                 logging.error(f"An error occurred while processing a comment: {e}")
@@ -287,11 +481,11 @@ class CheersFeature:
 
     def post_weekly_update(self):
         # Prepare the leaderboard content for cheers recipients
-        top_recipients = sorted(self.cheers_data.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_recipients = self.get_leaderboard('cheers', 10)
         recipient_leaderboard = '\n'.join([f"{idx+1}. u/{user} - {count} cheers" for idx, (user, count) in enumerate(top_recipients)])
 
         # Prepare the leaderboard content for cheers awarders
-        top_awarders = sorted(self.cheers_awarded_data.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_awarders = self.get_leaderboard('cheers_awarded', 10)
         awarders_leaderboard = '\n'.join([f"{idx+1}. u/{user} - {count} cheers awarded" for idx, (user, count) in enumerate(top_awarders)])
 
         content = f"**Cheers Leaderboard (Recipients):**\n\n{recipient_leaderboard}\n\n"
@@ -317,18 +511,21 @@ class CheersFeature:
         self.subreddit.submit(title="Weekly Cheers Leaderboard and Instructions", selftext=content, flair_id=template_id)
         logging.info("Posted the weekly cheers leaderboard and instructions.")
 
+    def check_weekly_update(self):
+        # Check if it's time to post the weekly update
+        current_time = datetime.utcnow()
+        if self.last_weekly_post_time is None or (current_time - self.last_weekly_post_time).days >= 7:
+            self.post_weekly_update()
+            self.last_weekly_post_time = current_time
+            self.save_last_weekly_post_time()
+            self.prune_rate_limit_data()
+
     def run(self):
         logging.info("Starting to monitor comments for cheers commands...")
-        while True:
-            try:
-                # Check if it's time to post the weekly update
-                current_time = datetime.utcnow()
-                if self.last_weekly_post_time is None or (current_time - self.last_weekly_post_time).days >= 7:
-                    self.post_weekly_update()
-                    self.last_weekly_post_time = current_time
-                    self.save_last_weekly_post_time()
-
-                self.monitor_comments()
-            except Exception as e:
-                logging.error(f"An error occurred: {e}")
-                time.sleep(60)  # Wait before retrying
+        self.comment_workers.start()
+
+        def check_and_monitor():
+            self.check_weekly_update()
+            self.monitor_comments()
+
+        run_with_reconnect(check_and_monitor)
@@ -2,10 +2,12 @@
 
 import logging
 import time
-import tempfile
-import threading
 import os
-import json
+import orjson
+import shelve
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 from praw.models import Redditor
 from praw.models.reddit.modmail import ModmailConversation
@@ -19,7 +21,10 @@ class EntryApprovalFeature:
         self.reddit = reddit
         self.subreddit = subreddit
         self.signature = signature
-        self.target_subreddits = ['superstonk', 'gme', 'deepfuckingvalue', 'gme_meltdown']  # Extend as needed
+        self.bot_username = self.reddit.user.me().name
+        self.target_subreddits = frozenset(['superstonk', 'gme', 'deepfuckingvalue', 'gme_meltdown'])  # Extend as needed
+        self.target_multireddit = self.reddit.subreddit('+'.join(sorted(self.target_subreddits)))
+        self.HISTORY_LIMIT = 100  # One listing page per history fetch
 
         # Initialize LangChain components
         self.llm = ChatOpenAI(model="gpt-4o",openai_api_key=openai_api_key)
@@ -41,43 +46,68 @@ class EntryApprovalFeature:
         )
         self.llm_chain = self.prompt_template | self.llm
 
-        # Initialize processed conversations set
-        self.processed_conversations_file = 'processed_conversations.json'
-        self.processed_conversations_lock = threading.Lock()
-        self.processed_conversations = self.load_processed_conversations()
+        # LLM verdicts keyed by a hash of the prompt content, so re-analysing the same history is free
+        self.llm_cache = shelve.open('llm_cache.db')
+
+        # Processed conversations are tracked in SQLite
+        self.DB_FILE = 'entry_approval.db'
+        self.db = self.init_db()
 
-    def load_processed_conversations(self):
+        # Legacy processed-conversation file, imported into the database on first start
+        self.processed_conversations_file = 'processed_conversations.json'
+        self.import_legacy_processed_conversations()
+
+        # Approved contributors, refreshed at most every APPROVED_CACHE_SECONDS
+        self.APPROVED_CACHE_SECONDS = 300
+        self._approved_cache = None
+        self._approved_cache_ts = 0
+
+    def init_db(self):
+        # Autocommit mode; the legacy import uses an explicit BEGIN/COMMIT
+        db = sqlite3.connect(self.DB_FILE, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS processed (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        return db
+
+    def load_legacy_processed_conversations(self):
+        conversations = set()
         if os.path.exists(self.processed_conversations_file):
             try:
-                with open(self.processed_conversations_file, 'r') as f:
-                    data = json.load(f)
+                with open(self.processed_conversations_file, 'rb') as f:
+                    data = orjson.loads(f.read())
                     if isinstance(data, dict) and 'conversations' in data:
-                        return set(data['conversations'])
+                        conversations.update(data['conversations'])
                     else:
                         logging.warning("Processed conversations file is not in expected format.")
-                        return set()
-            except (json.JSONDecodeError, IOError) as e:
+            except (orjson.JSONDecodeError, IOError) as e:
                 logging.error(f"Error reading processed conversations file: {e}")
-                return set()
-        else:
-            return set()
 
+        return conversations
 
-    def save_processed_conversations(self):
-        try:
-            with self.processed_conversations_lock:
-                data = {'conversations': list(self.processed_conversations)}
-                with tempfile.NamedTemporaryFile('w', delete=False, dir='.', suffix='.tmp') as tf:
-                    json.dump(data, tf)
-                    tempname = tf.name
-                os.replace(tempname, self.processed_conversations_file)
-        except IOError as e:
-            logging.error(f"Error saving processed conversations: {e}")
+    def import_legacy_processed_conversations(self):
+        # Only import into a fresh database
+        if self.db.execute("SELECT 1 FROM processed LIMIT 1").fetchone():
+            return
 
+        conversations = self.load_legacy_processed_conversations()
+        if conversations:
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany("INSERT OR IGNORE INTO processed (id) VALUES (?)", ((c,) for c in conversations))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            logging.info(f"Imported {len(conversations)} processed conversations from legacy file.")
+
+    def is_conversation_processed(self, conversation_id):
+        return self.db.execute("SELECT 1 FROM processed WHERE id = ?", (conversation_id,)).fetchone() is not None
 
     def mark_conversation_processed(self, conversation_id):
-        self.processed_conversations.add(conversation_id)
-        self.save_processed_conversations()
+        try:
+            self.db.execute("INSERT OR IGNORE INTO processed (id) VALUES (?)", (conversation_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Error saving processed conversation: {e}")
 
     def run(self, DEBUG=False):
         logging.info("Starting EntryApprovalFeature...")
@@ -94,14 +124,25 @@ class EntryApprovalFeature:
                 logging.error(f"Error in EntryApprovalFeature: {e}")
             time.sleep(300)  # Check every 300 seconds
 
+    def refresh_approved_cache(self):
+        try:
+            self._approved_cache = {contributor.name.lower() for contributor in self.subreddit.contributor(limit=None)}
+            self._approved_cache_ts = time.time()
+        except Exception as e:
+            logging.error(f"Error fetching approved contributors: {e}")
+
     def process_join_requests(self):
+        # Refresh the approved contributors once per pass rather than per request
+        if self._approved_cache is None or time.time() - self._approved_cache_ts > self.APPROVED_CACHE_SECONDS:
+            self.refresh_approved_cache()
+
         # Fetch modmail conversations in 'join_requests' state
         modmail_conversations = self.subreddit.modmail.conversations(state='join_requests')
         for conversation in modmail_conversations:
             conversation_id = conversation.id  # The conversation's base36 ID
 
             # Skip if we have already processed this conversation
-            if conversation_id in self.processed_conversations:
+            if self.is_conversation_processed(conversation_id):
                 continue
 
             author = conversation.user
@@ -153,34 +194,47 @@ class EntryApprovalFeature:
         cont_posts = []
         max_length = 300  # Set the maximum length for comments/posts
 
-        # Fetch user's top comments from target subreddits
-        for comment in user.comments.top(limit=1000):
-            if comment.subreddit.display_name.lower() in self.target_subreddits:
+        # The four listings are independent requests, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            top_comment_results, cont_comment_results, top_post_results, cont_post_results = executor.map(
+                lambda fetch: list(fetch()),
+                [
+                    lambda: user.comments.top(limit=self.HISTORY_LIMIT),
+                    lambda: user.comments.controversial(limit=self.HISTORY_LIMIT),
+                    lambda: self.target_multireddit.search(f"author:{user.name}", sort='top', limit=5),
+                    lambda: user.submissions.controversial(limit=self.HISTORY_LIMIT),
+                ]
+            )
+
+        # Filter user's top comments from target subreddits
+        target_subreddits = self.target_subreddits
+        for comment in top_comment_results:
+            subreddit_name = comment.subreddit.display_name.lower()
+            if subreddit_name in target_subreddits:
                 truncated_comment = self.truncate_text(comment.body, max_length=max_length)
                 top_comments.append(truncated_comment)
             if len(top_comments) >= 10:  # Limit to top 10 comments
                 break
 
-        # Fetch user's controversial comments from target subreddits
-        for comment in user.comments.controversial(limit=1000):
-            if comment.subreddit.display_name.lower() in self.target_subreddits:
+        # Filter user's controversial comments from target subreddits
+        for comment in cont_comment_results:
+            subreddit_name = comment.subreddit.display_name.lower()
+            if subreddit_name in target_subreddits:
                 truncated_comment = self.truncate_text(comment.body, max_length=max_length)
                 if truncated_comment not in top_comments:
                     cont_comments.append(truncated_comment)
             if len(cont_comments) >= 10:  # Limit to total of 10 comments
                 break
 
-        # Fetch user's top posts from target subreddits
-        for post in user.submissions.top(limit=100):
-            if post.subreddit.display_name.lower() in self.target_subreddits:
-                truncated_post = self.truncate_text(f"Title: {post.title}, Body: {post.selftext}", max_length=max_length)
-                top_posts.append(truncated_post)
-            if len(top_posts) >= 5:  # Limit to top 5 posts
-                break
+        # User's top posts from target subreddits, already filtered server-side
+        for post in top_post_results:
+            truncated_post = self.truncate_text(f"Title: {post.title}, Body: {post.selftext}", max_length=max_length)
+            top_posts.append(truncated_post)
 
-        # Fetch user's controversial posts from target subreddits
-        for post in user.submissions.controversial(limit=100):
-            if post.subreddit.display_name.lower() in self.target_subreddits:
+        # Filter user's controversial posts from target subreddits
+        for post in cont_post_results:
+            subreddit_name = post.subreddit.display_name.lower()
+            if subreddit_name in target_subreddits:
                 truncated_post = self.truncate_text(f"Title: {post.title}, Body: {post.selftext}", max_length=max_length)
                 if truncated_post not in top_posts:
                     cont_posts.append(truncated_post)
@@ -197,6 +251,12 @@ class EntryApprovalFeature:
             "\n\nPosts:\n" + "\n\n".join(top_posts) + "\n\n".join(cont_posts)
         )
 
+        # Reuse an earlier verdict for identical content
+        cache_key = hashlib.sha256(user_content.encode()).hexdigest()
+        if cache_key in self.llm_cache:
+            verdict, justification = self.llm_cache[cache_key]
+            return verdict, justification, False
+
         # Run through LLM
         response = self.llm_chain.invoke({"user_comments": user_content})
         response_content = response.content
@@ -205,31 +265,26 @@ class EntryApprovalFeature:
         lines = response_content.strip().split('\n')
         verdict = lines[0].split(':')[-1].strip()
         justification = '\n'.join(lines[1:]).strip()
+
+        self.llm_cache[cache_key] = (verdict, justification)
+        self.llm_cache.sync()
         return verdict, justification, False
 
     def is_user_approved(self, user: Redditor):
-        try:
-            # Check if the user is an approved contributor in the subreddit
-            for contributor in self.subreddit.contributor(limit=None):
-                if contributor.name == user.name:
-                    return True
-            return False
-        except Exception as e:
-            logging.error(f"Error checking if user is approved: {e}")
+        # Check if the user is an approved contributor in the subreddit
+        if self._approved_cache is None:
             return False
+        return user.name.lower() in self._approved_cache
 
     def has_prior_conversation(self, user: Redditor, conversation: ModmailConversation):
         try:
-            # Get the bot's username (assuming it's the same as the authenticated Reddit user)
-            bot_username = self.reddit.user.me().name
-
-            # Check if the conversation is already in a processed state
+            # Check if the conversation is already in a processed state before touching its messages
             if conversation.state in ['archived', 'mod_actioned', 'appeal', 'joined']:
                 return True  # User has already been processed (approved or rejected)
             
             # Check if the bot has already commented on the conversation
             for message in conversation.messages:
-                if message.author and message.author.name == bot_username:
+                if message.author and message.author.name == self.bot_username:
                     #logging.info(f"Bot has already commented in the conversation for u/{user.name}.")
                     return True  # Bot has already commented, so skip further review
 
@@ -266,7 +321,8 @@ class EntryApprovalFeature:
         """
         Truncate the text to the maximum number of words and append '...' if longer.
         """
-        words = text.split()
+        # Stop splitting once max_length words are found; the remainder stays in one piece
+        words = text.split(None, max_length)
         if len(words) > max_length:
             return ' '.join(words[:max_length]) + '...'
         return text
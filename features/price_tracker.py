@@ -1,30 +1,58 @@
 # features/price_tracker.py
 
-import time
 import logging
 import datetime
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPoolExecutor
 import pytz
-import pandas as pd
 import pandas_market_calendars as mcal
 import finnhub
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from prawcore.exceptions import NotFound, Forbidden
 import os
 
+from utils.data_utils import load_json, save_json
+from utils.ttl_cache import TTLCache
+
 
 class PriceTrackerFeature:
     def __init__(self, reddit, subreddit, finnhub_api_key, signature):
         self.reddit = reddit
         self.subreddit = subreddit
-        self.scheduler = BackgroundScheduler()
+        # Never run two copies of the same job and collapse missed runs, so a hung
+        # Finnhub/Reddit call doesn't pile up repeated runs behind it
+        self.scheduler = BackgroundScheduler(
+            executors={'default': SchedulerThreadPoolExecutor(2)},
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 120}
+        )
         self.ticker_symbol = 'GME'  # GameStop's ticker symbol
         self.company_name = 'GameStop'  # Company name
         self.timezone = pytz.timezone('US/Eastern')  # Stock market timezone
         self.nyse = mcal.get_calendar('NYSE')  # NYSE market calendar
+        self.trading_days_year = datetime.datetime.now(self.timezone).year
+        self.trading_days = self.load_trading_days(self.trading_days_year)  # Trading dates for trading_days_year
         self.finnhub_client = finnhub.Client(api_key=finnhub_api_key)
+        # Keep Finnhub connections pooled on the client's session and retry transient failures
+        finnhub_retry = Retry(total=3, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504))
+        self.finnhub_client._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=finnhub_retry))
+        self.QUOTE_CACHE_SECONDS = 60  # Jobs firing at the same time share one quote
+        self.quote_cache = TTLCache(ttl=self.QUOTE_CACHE_SECONDS)
+        self.quote_lock = threading.Lock()
         self.signature = signature
         self.submission_id = None  # To keep track of the Reddit post ID
-        self.weekly_data_file = 'weekly_data.json'  # JSON file to store weekly data
+        self.post_lock = threading.Lock()  # Serializes create_or_update_post across jobs
+        self.weekly_data_file = 'weekly_data.json'  # JSON snapshot of the weekly data
+        self.WEEKLY_FLUSH_INTERVAL = 4  # Write the weekly snapshot every N in-memory updates
+        self.weekly_data_lock = threading.Lock()
+        self.weekly_data = self.load_weekly_data()  # Week's open/high/low and daily rows keyed by date, or None
+        self.pending_weekly_updates = 0
+        atexit.register(self.flush_weekly_data)
+        self.flair_template_id = None  # "Discussion" flair template ID, fetched on first post
+        self.executor = ThreadPoolExecutor(max_workers=2)  # Overlaps Reddit lookups with Finnhub quotes
 
     def run(self, DEBUG=False):
         if DEBUG:
@@ -84,120 +112,160 @@ class PriceTrackerFeature:
                 timezone=self.timezone
             )
 
+            # Load next year's NYSE calendar at the start of the year, before the first market job
+            self.scheduler.add_job(
+                self.refresh_trading_days,
+                'cron',
+                month=1,
+                day=1,
+                hour=0,
+                minute=5,
+                timezone=self.timezone
+            )
+
+            # BackgroundScheduler runs jobs on its own thread, so there is nothing to wait on here
             self.scheduler.start()
             logging.info("PriceTrackerFeature started and scheduler is running.")
 
-            # Keep the thread alive
-            try:
-                while True:
-                    time.sleep(1)
-            except (KeyboardInterrupt, SystemExit):
-                self.scheduler.shutdown()
+    def stop(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+        self.executor.shutdown(wait=False)
+        self.flush_weekly_data()
 
-    def create_or_update_post(self, create=False, DEBUG=False):
-        try:
-            # Get current date and time
-            if DEBUG:
-                # Force a specific date for debugging purposes
-                debug_date = datetime.datetime.strptime("2024-09-23", '%Y-%m-%d').date()
-                now = datetime.datetime.combine(debug_date, datetime.datetime.now().time(), self.timezone)
-                today_str = debug_date.strftime('%Y-%m-%d')
-            else:
-                now = datetime.datetime.now(self.timezone)
-                today_str = now.strftime('%Y-%m-%d')
-
-            # Check if the market is open today
-            market_date = now.date() if not DEBUG else debug_date  # Use debug_date in DEBUG mode
-            if not self.is_market_open(market_date):
-                logging.warning(f"Market closed on {today_str}. No data available.")
-                return
-            else:
-                logging.info(f"Market is open on {today_str}. Proceeding with data fetch.")
+    def get_flair_template_id(self):
+        if self.flair_template_id is None:
+            choices = self.subreddit.flair.link_templates.user_selectable()
+            self.flair_template_id = next(x for x in choices if x["flair_text"] == "Discussion")["flair_template_id"]
+        return self.flair_template_id
 
-            # Fetch the current quote data for the given ticker symbol using Finnhub
-            quote = self.finnhub_client.quote(self.ticker_symbol)
-
-            if not quote:  # No data returned
-                logging.warning(f"No data fetched for {self.ticker_symbol}.")
-                return
-
-            # Extract required information from the Finnhub quote response
-            current_price = quote['c']
-            high_price = quote['h']
-            low_price = quote['l']
-            open_price = quote['o']
-            previous_close_price = quote['pc']
-            timestamp = pd.to_datetime(quote['t'], unit='s')
-
-            # Calculate the percentage change based on the previous close
-            dollar_change = current_price - previous_close_price
-            percentage_change = ((current_price - previous_close_price) / previous_close_price) * 100
+    def submit_post(self, title, content, template_id):
+        try:
+            return self.subreddit.submit(title=title, selftext=content, flair_id=template_id)
+        except (NotFound, Forbidden) as e:
+            # The cached flair template may have been removed; look it up again and retry once
+            logging.warning(f"Submit failed with flair {template_id}, refreshing flair template: {e}")
+            self.flair_template_id = None
+            return self.subreddit.submit(title=title, selftext=content, flair_id=self.get_flair_template_id())
+
+    def prefetch_flair_template_id(self):
+        # Start the flair lookup in the background so it overlaps the quote request
+        return self.executor.submit(self.get_flair_template_id)
+
+    def get_quote(self):
+        # Serialize fetches so simultaneous jobs wait for the first quote instead of requesting their own
+        with self.quote_lock:
+            quote = self.quote_cache.get(self.ticker_symbol)
+            if quote is None:
+                quote = self.finnhub_client.quote(self.ticker_symbol)
+                if quote:
+                    self.quote_cache.set(self.ticker_symbol, quote)
+            return quote
 
-            # Format dollar change
-            if abs(dollar_change) < 1:
-                dollar_change_cents = abs(dollar_change) * 100
-                dollar_change_formatted = f"{dollar_change:+.0f}¢"
-            else:
-                dollar_change_formatted = f"${dollar_change:+.2f}"
+    def create_or_update_post(self, create=False, DEBUG=False):
+        # The open, intraday and close jobs are separate scheduler jobs, so max_instances
+        # doesn't stop them overlapping; serialize them here so they don't race on submission_id
+        with self.post_lock:
+            try:
+                # Get current date and time
+                if DEBUG:
+                    # Force a specific date for debugging purposes
+                    debug_date = datetime.datetime.strptime("2024-09-23", '%Y-%m-%d').date()
+                    now = datetime.datetime.combine(debug_date, datetime.datetime.now().time(), self.timezone)
+                    today_str = debug_date.strftime('%Y-%m-%d')
+                else:
+                    now = datetime.datetime.now(self.timezone)
+                    today_str = now.strftime('%Y-%m-%d')
+
+                # Check if the market is open today
+                market_date = now.date() if not DEBUG else debug_date  # Use debug_date in DEBUG mode
+                if not self.is_market_open(market_date):
+                    logging.warning(f"Market closed on {today_str}. No data available.")
+                    return
+                else:
+                    logging.info(f"Market is open on {today_str}. Proceeding with data fetch.")
+
+                # Only a new post needs the flair; look it up while the quote is in flight
+                flair_future = self.prefetch_flair_template_id() if create or self.submission_id is None else None
+
+                # Fetch the current quote data for the given ticker symbol using Finnhub
+                quote = self.get_quote()
+
+                if not quote:  # No data returned
+                    logging.warning(f"No data fetched for {self.ticker_symbol}.")
+                    return
+
+                # Extract required information from the Finnhub quote response
+                current_price = quote['c']
+                high_price = quote['h']
+                low_price = quote['l']
+                open_price = quote['o']
+                previous_close_price = quote['pc']
+                timestamp = datetime.datetime.fromtimestamp(quote['t'], self.timezone)
+                quote_date_str = timestamp.strftime('%B %d, %Y')
+
+                # Calculate the percentage change based on the previous close
+                dollar_change = current_price - previous_close_price
+                percentage_change = ((current_price - previous_close_price) / previous_close_price) * 100
+
+                # Format dollar change
+                if abs(dollar_change) < 1:
+                    dollar_change_cents = abs(dollar_change) * 100
+                    dollar_change_formatted = f"{dollar_change:+.0f}¢"
+                else:
+                    dollar_change_formatted = f"${dollar_change:+.2f}"
 
-            # Determine the arrow for the percentage change
-            arrow = '🟩' if percentage_change > 0 else '🔻'
+                # Determine the arrow for the percentage change
+                arrow = '🟩' if percentage_change > 0 else '🔻'
 
-            # Prepare the post title with the percentage change and dollar amount change
-            percentage_change_formatted = f"{percentage_change:+.2f}%"
-            title = f"{arrow} {percentage_change_formatted}/{dollar_change_formatted} - {self.company_name} Closing Price ${current_price:.2f} ({timestamp.strftime('%B %d, %Y')})"
+                # Prepare the post title with the percentage change and dollar amount change
+                percentage_change_formatted = f"{percentage_change:+.2f}%"
+                title = f"{arrow} {percentage_change_formatted}/{dollar_change_formatted} - {self.company_name} Closing Price ${current_price:.2f} ({quote_date_str})"
 
-            # Prepare the post content with the previous day's closing price
-            content = f"""**{self.ticker_symbol} Daily Price Update for {timestamp.strftime('%B %d, %Y')}**
+                # Prepare the post content with the previous day's closing price
+                content = f"""**{self.ticker_symbol} Daily Price Update for {quote_date_str}**
 \n---\n
 | Previous Close | Open | High | Low | Close |
 |----------------|------|------|-----|-------|
 | ${previous_close_price:.2f} | ${open_price:.2f} | ${high_price:.2f} | ${low_price:.2f} | ${current_price:.2f} |
 """
 
-            # Append the signature to the content
-            content += self.signature
-
-            # Update weekly data in JSON file
-            self.update_weekly_data({
-                'date': timestamp.strftime('%Y-%m-%d'),
-                'open': open_price,
-                'high': high_price,
-                'low': low_price,
-                'close': current_price
-            })
-
-            # Get the flair template ID
-            choices = list(self.subreddit.flair.link_templates.user_selectable())
-            template_id = next(x for x in choices if x["flair_text"] == "Discussion")["flair_template_id"]
-
-            if create or self.submission_id is None:
-                # Create the post
-                if DEBUG:
-                    submission = self.reddit.drafts.create(
-                        title=title,
-                        selftext=content,
-                        flair_id=template_id,
-                        subreddit=self.subreddit
-                    )
+                # Append the signature to the content
+                content += self.signature
+
+                # Update weekly data in JSON file
+                self.update_weekly_data({
+                    'date': timestamp.strftime('%Y-%m-%d'),
+                    'open': open_price,
+                    'high': high_price,
+                    'low': low_price,
+                    'close': current_price
+                })
+
+                if create or self.submission_id is None:
+                    # Create the post
+                    template_id = flair_future.result()
+                    if DEBUG:
+                        submission = self.reddit.drafts.create(
+                            title=title,
+                            selftext=content,
+                            flair_id=template_id,
+                            subreddit=self.subreddit
+                        )
+                    else:
+                        submission = self.submit_post(title, content, template_id)
+                    self.submission_id = submission.id
+                    logging.info(f"Created new post for {today_str}")
                 else:
-                    submission = self.subreddit.submit(
-                        title=title,
-                        selftext=content,
-                        flair_id=template_id
-                    )
-                self.submission_id = submission.id
-                logging.info(f"Created new post for {now.strftime('%Y-%m-%d')}")
-            else:
-                # Fetch the submission
-                submission = self.reddit.submission(id=self.submission_id)
-                # Update the content
-                submission.edit(content)
-                # Update the title if needed
-                submission.mod.update(title=title)
-                logging.info(f"Updated post for {now.strftime('%Y-%m-%d')}")
-        except Exception as e:
-            logging.error(f"Error creating/updating post: {e}")
+                    # Fetch the submission
+                    submission = self.reddit.submission(id=self.submission_id)
+                    # Update the content
+                    submission.edit(content)
+                    # Update the title if needed
+                    submission.mod.update(title=title)
+                    logging.info(f"Updated post for {today_str}")
+            except Exception as e:
+                logging.error(f"Error creating/updating post: {e}")
 
     def store_weekly_open_price(self):
         try:
@@ -209,7 +277,7 @@ class PriceTrackerFeature:
                 return
 
             # Fetch the current price
-            quote = self.finnhub_client.quote(self.ticker_symbol)
+            quote = self.get_quote()
             if not quote:
                 logging.warning(f"No data fetched for {self.ticker_symbol}.")
                 return
@@ -217,16 +285,14 @@ class PriceTrackerFeature:
             open_price = quote['o']
 
             # Initialize weekly data
-            weekly_data = {
-                'open_price': open_price,
-                'high_price': open_price,
-                'low_price': open_price,
-                'daily_data': []  # List to store daily high and low
-            }
-
-            # Store the data in a JSON file
-            with open(self.weekly_data_file, 'w') as f:
-                json.dump(weekly_data, f)
+            with self.weekly_data_lock:
+                self.weekly_data = {
+                    'open_price': open_price,
+                    'high_price': open_price,
+                    'low_price': open_price,
+                    'daily_data': {}
+                }
+                self.write_weekly_data()
 
             logging.info(f"Stored weekly opening price: ${open_price:.2f}")
         except Exception as e:
@@ -234,33 +300,55 @@ class PriceTrackerFeature:
 
     def update_weekly_data(self, daily_quote):
         try:
-            # Read existing weekly data
-            if os.path.exists(self.weekly_data_file):
-                with open(self.weekly_data_file, 'r') as f:
-                    weekly_data = json.load(f)
-            else:
-                # If the file doesn't exist, initialize it
-                weekly_data = {
-                    'open_price': daily_quote['open'],
-                    'high_price': daily_quote['high'],
-                    'low_price': daily_quote['low'],
-                    'daily_data': []
-                }
+            with self.weekly_data_lock:
+                if self.weekly_data is None:
+                    self.weekly_data = {
+                        'open_price': daily_quote['open'],
+                        'high_price': daily_quote['high'],
+                        'low_price': daily_quote['low'],
+                        'daily_data': {}
+                    }
+
+                # Update high and low prices
+                self.weekly_data['high_price'] = max(self.weekly_data['high_price'], daily_quote['high'])
+                self.weekly_data['low_price'] = min(self.weekly_data['low_price'], daily_quote['low'])
+
+                # Later updates on the same day replace that day's row
+                self.weekly_data['daily_data'][daily_quote['date']] = daily_quote
+
+                # Only touch the disk every few updates; stop() and atexit write the rest
+                self.pending_weekly_updates += 1
+                if self.pending_weekly_updates >= self.WEEKLY_FLUSH_INTERVAL:
+                    self.write_weekly_data()
 
-            # Update high and low prices
-            weekly_data['high_price'] = max(weekly_data.get('high_price', daily_quote['high']), daily_quote['high'])
-            weekly_data['low_price'] = min(weekly_data.get('low_price', daily_quote['low']), daily_quote['low'])
+            logging.info("Updated weekly data with today's prices.")
+        except Exception as e:
+            logging.error(f"Error updating weekly data: {e}")
 
-            # Append daily data
-            weekly_data['daily_data'].append(daily_quote)
+    def load_weekly_data(self):
+        weekly_data = None
+        if os.path.exists(self.weekly_data_file):
+            weekly_data = load_json(self.weekly_data_file)
+            weekly_data['daily_data'] = {day['date']: day for day in weekly_data.get('daily_data', [])}
+        return weekly_data
 
-            # Write back to JSON file
-            with open(self.weekly_data_file, 'w') as f:
-                json.dump(weekly_data, f)
+    def write_weekly_data(self):
+        # Caller must hold weekly_data_lock
+        if self.weekly_data is None:
+            if os.path.exists(self.weekly_data_file):
+                os.remove(self.weekly_data_file)
+        else:
+            snapshot = dict(self.weekly_data, daily_data=list(self.weekly_data['daily_data'].values()))
+            save_json(snapshot, self.weekly_data_file)
+        self.pending_weekly_updates = 0
 
-            logging.info("Updated weekly data with today's prices.")
+    def flush_weekly_data(self):
+        try:
+            with self.weekly_data_lock:
+                if self.pending_weekly_updates:
+                    self.write_weekly_data()
         except Exception as e:
-            logging.error(f"Error updating weekly data: {e}")
+            logging.error(f"Error saving weekly data: {e}")
 
     def post_weekly_update(self):
         try:
@@ -271,21 +359,23 @@ class PriceTrackerFeature:
                 logging.warning(f"Market closed on {market_date}. Cannot post weekly update.")
                 return
 
+            flair_future = self.prefetch_flair_template_id()
+
             # Fetch the current price
-            quote = self.finnhub_client.quote(self.ticker_symbol)
+            quote = self.get_quote()
             if not quote:
                 logging.warning(f"No data fetched for {self.ticker_symbol}.")
                 return
 
             close_price = quote['c']
+            week_ending_str = now.strftime('%B %d, %Y')
 
-            # Read the weekly data from the JSON file
-            if not os.path.exists(self.weekly_data_file):
-                logging.error("Weekly data file not found.")
-                return
-
-            with open(self.weekly_data_file, 'r') as f:
-                weekly_data = json.load(f)
+            # Take a snapshot of the in-memory weekly data
+            with self.weekly_data_lock:
+                if self.weekly_data is None:
+                    logging.error("No weekly data recorded.")
+                    return
+                weekly_data = dict(self.weekly_data, daily_data=list(self.weekly_data['daily_data'].values()))
 
             open_price = weekly_data['open_price']
             high_price = weekly_data['high_price']
@@ -308,44 +398,64 @@ class PriceTrackerFeature:
             percentage_change_formatted = f"{percentage_change:+.2f}%"
 
             # Prepare the post title
-            title = f"{arrow} {percentage_change_formatted}/{dollar_change_formatted} - {self.company_name} Weekly Price Update ({now.strftime('%B %d, %Y')})"
+            title = f"{arrow} {percentage_change_formatted}/{dollar_change_formatted} - {self.company_name} Weekly Price Update ({week_ending_str})"
 
             # Prepare the post content with weekly high and low
-            content = f"""**{self.ticker_symbol} Weekly Price Update for Week Ending {now.strftime('%B %d, %Y')}**
+            parts = [f"""**{self.ticker_symbol} Weekly Price Update for Week Ending {week_ending_str}**
 \n---\n
 | Open (Monday) | High | Low | Close (Friday) | Change |
 |---------------|------|-----|----------------|--------|
 | ${open_price:.2f} | ${high_price:.2f} | ${low_price:.2f} | ${close_price:.2f} | {percentage_change_formatted}/{dollar_change_formatted} |
-"""
+"""]
 
             # Append daily summaries
-            content += "\n**Daily Summaries:**\n\n"
-            content += "| Date | Open | High | Low | Close |\n"
-            content += "|------|------|------|-----|-------|\n"
-            for day in weekly_data['daily_data']:
-                content += f"| {day['date']} | ${day['open']:.2f} | ${day['high']:.2f} | ${day['low']:.2f} | ${day['close']:.2f} |\n"
+            parts.append("\n**Daily Summaries:**\n\n")
+            parts.append("| Date | Open | High | Low | Close |\n")
+            parts.append("|------|------|------|-----|-------|\n")
+            parts.extend(
+                f"| {day['date']} | ${day['open']:.2f} | ${day['high']:.2f} | ${day['low']:.2f} | ${day['close']:.2f} |\n"
+                for day in weekly_data['daily_data']
+            )
 
-            # Append the signature to the content
-            content += self.signature
+            # Append the signature and join the pieces once
+            parts.append(self.signature)
+            content = ''.join(parts)
 
             # Post to subreddit
-            choices = list(self.subreddit.flair.link_templates.user_selectable())
-            template_id = next(x for x in choices if x["flair_text"] == "Discussion")["flair_template_id"]
-            self.subreddit.submit(title=title, selftext=content, flair_id=template_id)
+            template_id = flair_future.result()
+            self.submit_post(title, content, template_id)
 
-            logging.info(f"Posted weekly price update for {now.strftime('%Y-%m-%d')}")
+            logging.info(f"Posted weekly price update for {market_date}")
 
-            # Remove the weekly data file after posting
-            os.remove(self.weekly_data_file)
-            logging.info("Cleared weekly data file after posting weekly update.")
+            # Clear the weekly data after posting
+            with self.weekly_data_lock:
+                self.weekly_data = None
+                self.write_weekly_data()
+            logging.info("Cleared weekly data after posting weekly update.")
 
         except Exception as e:
             logging.error(f"Error posting weekly update: {e}")
 
+    def load_trading_days(self, year):
+        # Fetch the whole year's NYSE trading days once
+        valid_days = self.nyse.valid_days(start_date=f'{year}-01-01', end_date=f'{year}-12-31')
+        return frozenset(valid_days.date)
+
+    def refresh_trading_days(self):
+        try:
+            year = datetime.datetime.now(self.timezone).year
+            self.trading_days = self.load_trading_days(year)
+            self.trading_days_year = year
+            logging.info(f"Loaded NYSE trading days for {year}.")
+        except Exception as e:
+            logging.error(f"Error loading trading days: {e}")
+
     def is_market_open(self, date):
-        # Get the NYSE trading schedule for the specific date
-        schedule = self.nyse.valid_days(start_date=date, end_date=date)
+        # Load the calendar for another year if needed (year rollover, debug dates)
+        if date.year != self.trading_days_year:
+            self.trading_days = self.load_trading_days(date.year)
+            self.trading_days_year = date.year
 
-        # Check if the market is open on the given date (if schedule is not empty)
-        return not schedule.empty
+        # Check if the market is open on the given date
+        return date in self.trading_days
 
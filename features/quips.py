@@ -1,16 +1,19 @@
 # features/quips.py
 
-import os
 import time
-import json
 import logging
 import threading
-import re
+import atexit
+import calendar
 from datetime import datetime
 import praw
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 
+from utils.data_utils import load_json, save_json
+from utils.idle_backoff import IdleBackoff, run_with_reconnect
+from utils.worker_pool import WorkerPool
+
 
 class QuipsFeature:
     def __init__(self, reddit, subreddit, signature, openai_api_key):
@@ -18,6 +21,7 @@ class QuipsFeature:
         self.subreddit = subreddit
         self.signature = signature
         self.REDDIT_USERNAME = self.reddit.user.me().name
+        self.REDDIT_USERNAME_LOWER = self.REDDIT_USERNAME.lower()
 
         # Initialize LLM
         self.llm = ChatOpenAI(
@@ -40,77 +44,132 @@ class QuipsFeature:
         # Rate limiting
         self.RATE_LIMIT_FILE = 'quips_rate_limit.json'
         self.COOLDOWN_SECONDS = 600  # 10 minutes
+        self.RATE_LIMIT_FLUSH_UPDATES = 10  # Write the rate limit file after this many replies...
+        self.RATE_LIMIT_FLUSH_SECONDS = 30  # ...or at least this often while there are unsaved replies
         self.lock = threading.Lock()
-        self.rate_limit_data = self.load_json_data(self.RATE_LIMIT_FILE)
+        self.rate_limit_data = self.load_rate_limit_data()  # author name -> epoch seconds of last response
+        self.pending_rate_limit_updates = 0
+        self.flush_event = threading.Event()
+        atexit.register(self.flush_rate_limit_data)
+
+        # Comment stream producer feeds worker threads so LLM calls don't stall the stream
+        self.comment_workers = WorkerPool('quips', self.process_comment)
 
     def load_json_data(self, file_name):
         with self.lock:
-            if os.path.exists(file_name):
-                with open(file_name, 'r') as f:
-                    return json.load(f)
-            else:
-                return {}
+            return load_json(file_name)
+
+    def load_rate_limit_data(self):
+        rate_limit_data = self.load_json_data(self.RATE_LIMIT_FILE)
+        # Older files stored UTC timestamps as strings
+        return {
+            author_name: calendar.timegm(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timetuple())
+            if isinstance(timestamp, str) else timestamp
+            for author_name, timestamp in rate_limit_data.items()
+        }
+
+    def prune_rate_limit_data(self):
+        # Caller must hold self.lock; entries past the cooldown no longer limit anyone
+        cutoff = time.time() - self.COOLDOWN_SECONDS
+        self.rate_limit_data = {
+            author_name: timestamp
+            for author_name, timestamp in self.rate_limit_data.items()
+            if timestamp > cutoff
+        }
+
+    def flush_rate_limit_data(self):
+        try:
+            with self.lock:
+                if self.pending_rate_limit_updates:
+                    self.prune_rate_limit_data()
+                    save_json(self.rate_limit_data, self.RATE_LIMIT_FILE)
+                    self.pending_rate_limit_updates = 0
+        except Exception as e:
+            logging.error(f"Failed to save quips rate limit data: {e}")
 
-    def save_json_data(self, data, file_name):
-        with self.lock:
-            with open(file_name, 'w') as f:
-                json.dump(data, f)
+    def flush_rate_limit_periodically(self):
+        while True:
+            # Woken early once enough replies have piled up
+            self.flush_event.wait(self.RATE_LIMIT_FLUSH_SECONDS)
+            self.flush_event.clear()
+            self.flush_rate_limit_data()
 
     def monitor_comments(self):
         logging.info("Starting to monitor comments for quips...")
-        for comment in self.subreddit.stream.comments(skip_existing=True):
+        # pause_after=0 yields None whenever a poll finds nothing new; PRAW does not sleep
+        # in that case, so back off exponentially here until comments arrive again
+        idle_backoff = IdleBackoff()
+        for comment in self.subreddit.stream.comments(skip_existing=True, pause_after=0):
+            if comment is None:
+                idle_backoff.wait()
+                continue
+            idle_backoff.reset()
+
             try:
-                if comment.author.name == self.REDDIT_USERNAME:
+                # Skip deleted authors and the bot's own comments; the stream already carries the author name
+                author = comment.author
+                if author is None or author.name.lower() == self.REDDIT_USERNAME_LOWER:
                     continue
 
-                # Check if the comment is a reply to a post or comment made by the bot
-                parent = comment.parent()
-                is_reply_to_bot = False
-                if isinstance(parent, praw.models.Comment) or isinstance(parent, praw.models.Submission):
-                    if parent.author and parent.author.name == self.REDDIT_USERNAME:
-                        is_reply_to_bot = True
+                # Deleted comments can come through without a body
+                body = comment.body
+                if not body:
+                    continue
 
-                # Check if the comment contains '!gimmy' (case-insensitive)
-                contains_gimmy = re.search(r'!gimmy', comment.body, re.IGNORECASE) is not None
+                # Fold case once and run both trigger checks against it
+                body_folded = body.casefold()
 
-                # Check if the comment invokes the cheers command
-                invokes_cheers = re.search(r'!cheers', comment.body, re.IGNORECASE) is not None
+                # Leave '!cheers' commands to the cheers feature, before fetching the parent
+                if '!cheers' in body_folded:
+                    continue
 
-                # If the comment is a reply to the bot or contains '!gimmy', and does not invoke '!cheers'
-                if (is_reply_to_bot or contains_gimmy) and not invokes_cheers:
-                    self.process_comment(comment)
+                # '!gimmy' (case-insensitive) always gets a reply; otherwise only replies to the bot do
+                parent = None
+                if '!gimmy' not in body_folded:
+                    parent = comment.parent()
+                    if not (isinstance(parent, (praw.models.Comment, praw.models.Submission))
+                            and parent.author and parent.author.name.lower() == self.REDDIT_USERNAME_LOWER):
+                        continue
+
+                # Pass along the parent if it was fetched so the worker doesn't fetch it again
+                self.comment_workers.submit(comment, parent)
             except Exception as e:
                 logging.error(f"An error occurred while processing a comment: {e}")
                 continue
 
-    def process_comment(self, comment):
+    def process_comment(self, comment, parent=None):
         author_name = comment.author.name
-        current_time = datetime.utcnow()
-
-        # Rate limiting check
-        last_response_time_str = self.rate_limit_data.get(author_name)
-        if last_response_time_str:
-            last_response_time = datetime.strptime(last_response_time_str, "%Y-%m-%d %H:%M:%S")
-            if (current_time - last_response_time).total_seconds() < self.COOLDOWN_SECONDS:
-                logging.info(f"User {author_name} is on cooldown.")
-                # Calculate how much time remains
-                time_remaining = int((self.COOLDOWN_SECONDS - time_since_last_response) // 60) + 1
-                response_content = (
-                    f"Sorry u/{author_name}, you can only request a response every 10 minutes. "
-                    f"Please wait {time_remaining} more minute(s)."
-                )
-                response_content += self.signature
-                # Reply to the comment
-                try:
-                    comment.reply(response_content)
-                    logging.info(f"Informed {author_name} about cooldown.")
-                except Exception as e:
-                    logging.error(f"Failed to reply to {author_name} about cooldown: {e}")
-                return  # Do not proceed further
-
-        # Update rate limit data
-        self.rate_limit_data[author_name] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        self.save_json_data(self.rate_limit_data, self.RATE_LIMIT_FILE)
+        current_time = time.time()
+
+        # Rate limiting check; check and record under one lock so concurrent workers
+        # can't both pass the cooldown for the same author
+        with self.lock:
+            last_response_time = self.rate_limit_data.get(author_name)
+            time_since_last_response = None if last_response_time is None else current_time - last_response_time
+            on_cooldown = time_since_last_response is not None and time_since_last_response < self.COOLDOWN_SECONDS
+            if not on_cooldown:
+                # Update rate limit data; the flusher thread persists it
+                self.rate_limit_data[author_name] = current_time
+                self.pending_rate_limit_updates += 1
+                if self.pending_rate_limit_updates >= self.RATE_LIMIT_FLUSH_UPDATES:
+                    self.flush_event.set()
+
+        if on_cooldown:
+            logging.info(f"User {author_name} is on cooldown.")
+            # Calculate how much time remains
+            time_remaining = int((self.COOLDOWN_SECONDS - time_since_last_response) // 60) + 1
+            response_content = (
+                f"Sorry u/{author_name}, you can only request a response every 10 minutes. "
+                f"Please wait {time_remaining} more minute(s)."
+            )
+            response_content += self.signature
+            # Reply to the comment
+            try:
+                comment.reply(response_content)
+                logging.info(f"Informed {author_name} about cooldown.")
+            except Exception as e:
+                logging.error(f"Failed to reply to {author_name} about cooldown: {e}")
+            return  # Do not proceed further
 
         user_content = comment.body
 
@@ -121,7 +180,8 @@ class QuipsFeature:
 
         # Get parent comment's body if available and not too long
         parent_content = ""
-        parent = comment.parent()
+        if parent is None:
+            parent = comment.parent()
         if isinstance(parent, praw.models.Comment):
             parent_body = parent.body
             max_parent_length = 500  # Adjust as needed
@@ -168,9 +228,6 @@ class QuipsFeature:
             logging.error(f"Failed to reply to comment by {author_name}: {e}")
 
     def run(self):
-        while True:
-            try:
-                self.monitor_comments()
-            except Exception as e:
-                logging.error(f"An error occurred: {e}")
-                time.sleep(60)  # Wait before retrying
+        threading.Thread(target=self.flush_rate_limit_periodically, daemon=True).start()
+        self.comment_workers.start()
+        run_with_reconnect(self.monitor_comments)
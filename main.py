@@ -1,6 +1,7 @@
 # main.py
 
 import os
+import signal
 import threading
 import logging
 import praw
@@ -78,23 +79,27 @@ def main():
     entry_approval_feature = EntryApprovalFeature(reddit, subreddit, signature, OPENAI_API_KEY)
     quips_feature = QuipsFeature(reddit, subreddit, signature, OPENAI_API_KEY)
 
-    # Run features in separate threads
-    cheers_thread = threading.Thread(target=cheers_feature.run)
-    price_tracker_thread = threading.Thread(target=price_tracker_feature.run)
-    entry_approval_thread = threading.Thread(target=entry_approval_feature.run)
-    quips_thread = threading.Thread(target=quips_feature.run)
+    # Run features in separate daemon threads so they exit with the main thread
+    cheers_thread = threading.Thread(target=cheers_feature.run, daemon=True)
+    entry_approval_thread = threading.Thread(target=entry_approval_feature.run, daemon=True)
+    quips_thread = threading.Thread(target=quips_feature.run, daemon=True)
 
     cheers_thread.start()
-    price_tracker_thread.start()
     entry_approval_thread.start()
     quips_thread.start()
 
-    # Keep the main thread alive
+    # The price tracker's scheduler runs on its own thread
+    price_tracker_feature.run()
+
+    # Block the main thread until interrupted or terminated
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
     try:
-        while True:
-            pass
+        stop.wait()
     except KeyboardInterrupt:
-        logging.info("Shutting down bot...")
+        pass
+    logging.info("Shutting down bot...")
+    price_tracker_feature.stop()
 
 if __name__ == "__main__":
     main()
@@ -69,8 +69,7 @@ def main():
 
     # Keep the main thread alive
     try:
-        while True:
-            pass
+        threading.Event().wait()
     except KeyboardInterrupt:
         logging.info("Shutting down bot...")
 
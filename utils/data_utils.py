@@ -0,0 +1,21 @@
+# data_utils.py
+
+import os
+import orjson
+
+def load_json(file_name):
+    if os.path.exists(file_name):
+        with open(file_name, 'rb') as f:
+            return orjson.loads(f.read())
+    else:
+        return {}
+
+def save_json(data, file_name):
+    # Write to a temp file and rename over the target so a crash never leaves a torn file
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        f.write(orjson.dumps(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)
+
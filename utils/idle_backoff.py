@@ -0,0 +1,34 @@
+# idle_backoff.py
+
+import logging
+import time
+
+class IdleBackoff:
+    # Exponential wait between empty stream polls, doubling up to max_seconds like
+    # PRAW's own stream backoff; reset() once the stream yields something again
+    def __init__(self, min_seconds=1, max_seconds=16):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.delay = min_seconds
+
+    def reset(self):
+        self.delay = self.min_seconds
+
+    def wait(self):
+        time.sleep(self.delay)
+        self.delay = min(self.delay * 2, self.max_seconds)
+
+def run_with_reconnect(target, min_seconds=5, max_seconds=300):
+    # Call target() forever, waiting with exponential backoff after each failure.
+    # A run that stayed up longer than max_seconds starts the backoff over
+    retry_seconds = min_seconds
+    while True:
+        started = time.time()
+        try:
+            target()
+        except Exception as e:
+            logging.error(f"An error occurred: {e}")
+            if time.time() - started > max_seconds:
+                retry_seconds = min_seconds
+            time.sleep(retry_seconds)  # Wait before retrying
+            retry_seconds = min(retry_seconds * 2, max_seconds)
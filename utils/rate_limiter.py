@@ -2,25 +2,29 @@
 
 import threading
 import time
+from collections import deque
 
 class RateLimiter:
+    # Sliding window: at most max_calls calls start within any period seconds
     def __init__(self, max_calls, period):
         self.lock = threading.Lock()
-        self.calls = []
+        self.calls = deque()  # Start times of recent and reserved calls, in order
         self.max_calls = max_calls
         self.period = period
 
     def acquire(self):
         with self.lock:
-            now = time.time()
+            now = time.monotonic()
             # Remove calls older than the period
-            self.calls = [call for call in self.calls if now - call < self.period]
+            while self.calls and now - self.calls[0] >= self.period:
+                self.calls.popleft()
+            # Reserve the earliest slot that keeps the window within max_calls
             if len(self.calls) >= self.max_calls:
-                # Need to wait before making a new call
-                sleep_time = self.period - (now - self.calls[0])
-                time.sleep(sleep_time)
-                now = time.time()
-                # Clean up old calls again after sleeping
-                self.calls = [call for call in self.calls if now - call < self.period]
-            # Record the new call
-            self.calls.append(now)
+                slot = max(now, self.calls[-self.max_calls] + self.period)
+            else:
+                slot = now
+            self.calls.append(slot)
+        # Wait outside the lock so other callers can reserve their slots meanwhile
+        sleep_time = slot - now
+        if sleep_time > 0:
+            time.sleep(sleep_time)
@@ -0,0 +1,34 @@
+# ttl_cache.py
+
+import threading
+import time
+
+class TTLCache:
+    def __init__(self, ttl, maxsize=4096):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                # Entry has expired
+                del self.entries[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.maxsize:
+                # Evict the oldest entry
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = (value, time.time() + self.ttl)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
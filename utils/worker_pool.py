@@ -0,0 +1,35 @@
+# worker_pool.py
+
+import logging
+import queue
+import threading
+
+class WorkerPool:
+    # Bounded queue drained by daemon threads that call handler(*item) for each submitted item
+    def __init__(self, name, handler, worker_count=4, maxsize=100):
+        self.name = name
+        self.handler = handler
+        self.worker_count = worker_count
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.workers = []
+
+    def start(self):
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self.process_queue, name=f"{self.name}-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, *item):
+        # Blocks when the workers fall behind, which throttles the producer
+        self.queue.put(item)
+
+    def process_queue(self):
+        # Worker loop: handle queued items so their I/O latency overlaps
+        while True:
+            item = self.queue.get()
+            try:
+                self.handler(*item)
+            except Exception as e:
+                logging.error(f"An error occurred in {self.name} worker: {e}")
+            finally:
+                self.queue.task_done()